@@ -3,10 +3,16 @@ Super Analyst MAE Calculator - Web Interface
 Simple, beautiful UI for calculating QA system accuracy
 """
 
+import io
+
 import streamlit as st
 import pandas as pd
-from mae_calculator import calculate_mae, interpret_mae, calculate_batch_mae
+import numpy as np
+from mae_calculator import (KPIS, SCORE_MIN, SCORE_MAX, calculate_mae, calculate_mae_arr, interpret_mae,
+                            calculate_batch_mae_fast)
 import json
+import pyarrow as pa
+import pyarrow.csv as pv
 
 # Page configuration
 st.set_page_config(
@@ -49,15 +55,37 @@ mode = st.sidebar.radio(
     ["Single Chat", "Batch Upload (CSV)", "Quick Test"]
 )
 
-# KPI list
-KPIS = [
-    'IssueIdentification',
-    'ResolutionCompliance',
-    'Clarity',
-    'Retention',
-    'Sentiment',
-    'CustomerCentricity'
-]
+# Batch CSV column names, in KPIS order
+AI_COLS = tuple(f'ai_{kpi}' for kpi in KPIS)
+HUMAN_COLS = tuple(f'human_{kpi}' for kpi in KPIS)
+
+# Fixed schema for batch CSV uploads; scores are parsed wide so range and
+# whole-number checks see the uploaded values before narrowing to int8
+CSV_DTYPES = {
+    'chat_id': 'string',
+    **dict.fromkeys(AI_COLS, 'float64'),
+    **dict.fromkeys(HUMAN_COLS, 'float64')
+}
+
+# Bytes per block when streaming a batch CSV through pyarrow
+CSV_BLOCK_SIZE = 8 << 20
+
+# Sample template for batch uploads, serialized once per process
+_SAMPLE_CSV_BYTES: bytes = pd.DataFrame({
+    'chat_id': ['27811316', '27811317'],
+    'ai_IssueIdentification': [4, 3],
+    'ai_ResolutionCompliance': [3, 2],
+    'ai_Clarity': [2, 3],
+    'ai_Retention': [2, 3],
+    'ai_Sentiment': [3, 4],
+    'ai_CustomerCentricity': [4, 3],
+    'human_IssueIdentification': [4, 4],
+    'human_ResolutionCompliance': [3, 3],
+    'human_Clarity': [2, 2],
+    'human_Retention': [2, 3],
+    'human_Sentiment': [4, 4],
+    'human_CustomerCentricity': [3, 4]
+}).to_csv(index=False).encode()
 
 def get_mae_color_class(mae):
     """Return CSS class based on MAE value"""
@@ -71,44 +99,134 @@ def get_mae_color_class(mae):
         return "poor"
 
 
+def _validated_scores(scores: np.ndarray, cols: tuple, first_row: int) -> np.ndarray:
+    """Check a block of score columns holds whole numbers in range, then narrow to int8"""
+    invalid = (scores < SCORE_MIN) | (scores > SCORE_MAX) | (scores != np.round(scores))
+    if invalid.any():
+        row, col = np.argwhere(invalid)[0]
+        raise ValueError(f"Column '{cols[col]}' has score {scores[row, col]:g} on data row "
+                         f"{first_row + row + 1}; scores must be whole numbers "
+                         f"{SCORE_MIN}-{SCORE_MAX}")
+    return scores.astype(np.int8)
+
+
+def _score_matrix(batch: pa.RecordBatch, cols: tuple, first_row: int) -> np.ndarray:
+    """Stack one record batch's score columns into an (N, KPI) int8 matrix"""
+    for col in cols:
+        column = batch.column(col)
+        if column.null_count:
+            row = int(np.flatnonzero(column.is_null().to_numpy(zero_copy_only=False))[0])
+            raise ValueError(f"Column '{col}' is blank on data row {first_row + row + 1}; "
+                             f"every score must be filled in")
+    # No nulls, so each column converts zero-copy as float64
+    return _validated_scores(np.column_stack([batch.column(col).to_numpy() for col in cols]),
+                             cols, first_row)
+
+
+def _iter_score_blocks(file_bytes: bytes):
+    """Yield (chat_ids, ai_mat, human_mat, fraction_read) blocks from an uploaded CSV"""
+    # Stream record batches so only one block is converted at a time
+    approx_rows = max(file_bytes.count(b'\n') - 1, 1)
+    rows_read = 0
+    reader = pv.open_csv(
+        io.BytesIO(file_bytes),
+        read_options=pv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+        convert_options=pv.ConvertOptions(column_types={
+            col: pa.type_for_alias(dtype) for col, dtype in CSV_DTYPES.items()
+        })
+    )
+    missing = [col for col in CSV_DTYPES if col not in reader.schema.names]
+    if missing:
+        raise KeyError(", ".join(missing))
+    for batch in reader:
+        first_row = rows_read
+        rows_read += batch.num_rows
+        yield (batch.column('chat_id').to_numpy(zero_copy_only=False),
+               _score_matrix(batch, AI_COLS, first_row),
+               _score_matrix(batch, HUMAN_COLS, first_row),
+               rows_read / approx_rows)
+
+
+def _results_csv_bytes(results_df: pd.DataFrame) -> bytes:
+    """Serialize batch results to CSV straight from the result columns"""
+    # Missing chat IDs count as needing quoting so pandas renders them
+    if results_df['Chat ID'].str.contains(r'[,"\r\n]', na=True).any():
+        return results_df.to_csv(index=False, float_format='%.2f').encode()
+    
+    out = io.StringIO()
+    out.write(",".join(results_df.columns) + "\n")
+    out.writelines(
+        f"{chat_id},{mae:.2f},{total},{interpretation}\n"
+        for chat_id, mae, total, interpretation in zip(
+            results_df['Chat ID'].tolist(), results_df['MAE'].tolist(),
+            results_df['Total Diff'].tolist(), results_df['Interpretation'].tolist()
+        )
+    )
+    return out.getvalue().encode()
+
+
+@st.cache_data(show_spinner=False)
+def _parse_and_score(file_bytes: bytes) -> tuple[float, pd.DataFrame, bytes]:
+    """Score every chat in an uploaded CSV; cached on the file contents"""
+    # Created inside the cached function so a cache hit replays it safely
+    progress = st.progress(0.0, text="Scoring chats...")
+    # Seed each list with an empty block so a header-only CSV still concatenates
+    chat_id_parts = [np.empty(0, dtype=object)]
+    mae_parts = [np.empty(0)]
+    total_parts = [np.empty(0, dtype=np.int32)]
+    interp_parts = [np.empty(0, dtype=object)]
+    mae_sum, count = 0.0, 0
+    
+    for chat_ids, ai_mat, human_mat, fraction_read in _iter_score_blocks(file_bytes):
+        mae_vec, total_vec, interp_arr = calculate_batch_mae_fast(ai_mat, human_mat)
+        mae_sum += float(mae_vec.sum())
+        count += len(mae_vec)
+        
+        chat_id_parts.append(chat_ids)
+        mae_parts.append(mae_vec)
+        total_parts.append(total_vec)
+        interp_parts.append(interp_arr)
+        progress.progress(min(fraction_read, 1.0), text="Scoring chats...")
+    
+    progress.empty()
+    avg_mae = mae_sum / count if count else 0.0
+    
+    chat_ids = np.concatenate(chat_id_parts)
+    mae_vec = np.concatenate(mae_parts)
+    total_vec = np.concatenate(total_parts).astype(np.int32)
+    interp_arr = np.concatenate(interp_parts)
+    
+    results_df = pd.DataFrame({
+        'Chat ID': chat_ids,
+        'MAE': np.round(mae_vec, 2),
+        'Total Diff': total_vec,
+        'Interpretation': interp_arr
+    })
+    
+    return avg_mae, results_df, _results_csv_bytes(results_df)
+
+
 # MODE 1: SINGLE CHAT
 if mode == "Single Chat":
     st.header("🎯 Single Chat Evaluation")
     
-    col1, col2 = st.columns(2)
+    chat_id = st.text_input("Chat ID:", value="27811316")
     
-    with col1:
-        st.subheader("🤖 AI Scores")
-        chat_id = st.text_input("Chat ID:", value="27811316")
-        
-        ai_scores = {}
-        for kpi in KPIS:
-            ai_scores[kpi] = st.slider(
-                f"{kpi}:",
-                min_value=0,
-                max_value=5,
-                value=3,
-                key=f"ai_{kpi}"
-            )
-    
-    with col2:
-        st.subheader("👤 Human Scores")
-        st.write("")  # Spacing to align with chat_id input
-        st.write("")
-        
-        human_scores = {}
-        for kpi in KPIS:
-            human_scores[kpi] = st.slider(
-                f"{kpi}:",
-                min_value=0,
-                max_value=5,
-                value=3,
-                key=f"human_{kpi}"
-            )
+    # One editable table for all KPI scores
+    st.subheader("🤖 AI vs 👤 Human Scores")
+    score_column = st.column_config.NumberColumn(min_value=0, max_value=5, step=1, required=True)
+    edited = st.data_editor(
+        pd.DataFrame({'AI': [3] * len(KPIS), 'Human': [3] * len(KPIS)}, index=KPIS),
+        column_config={'AI': score_column, 'Human': score_column},
+        use_container_width=True,
+        key="single_chat_scores"
+    )
+    ai_arr = edited['AI'].to_numpy(dtype=np.int8)
+    human_arr = edited['Human'].to_numpy(dtype=np.int8)
     
     # Calculate button
     if st.button("Calculate MAE", type="primary", use_container_width=True):
-        result = calculate_mae(ai_scores, human_scores)
+        result = calculate_mae_arr(ai_arr, human_arr)
         
         st.markdown("---")
         st.header("📈 Results")
@@ -127,17 +245,13 @@ if mode == "Single Chat":
         # Detailed breakdown
         st.subheader("📋 KPI Breakdown")
         
-        df_data = []
-        for kpi in KPIS:
-            df_data.append({
-                'KPI': kpi,
-                'AI Score': ai_scores[kpi],
-                'Human Score': human_scores[kpi],
-                'Difference': result.kpi_differences[kpi],
-                'Match': '✅' if result.kpi_differences[kpi] == 0 else '❌'
-            })
-        
-        df = pd.DataFrame(df_data)
+        df = pd.DataFrame({
+            'KPI': KPIS,
+            'AI Score': ai_arr,
+            'Human Score': human_arr,
+            'Difference': result.kpi_diff_arr,
+            'Match': np.where(result.kpi_diff_arr == 0, '✅', '❌')
+        })
         st.dataframe(df, use_container_width=True, hide_index=True)
 
 
@@ -148,26 +262,9 @@ elif mode == "Batch Upload (CSV)":
     st.info("Upload a CSV file with columns: chat_id, ai_IssueIdentification, ai_ResolutionCompliance, ai_Clarity, ai_Retention, ai_Sentiment, ai_CustomerCentricity, human_IssueIdentification, human_ResolutionCompliance, human_Clarity, human_Retention, human_Sentiment, human_CustomerCentricity")
     
     # Sample CSV download
-    sample_data = {
-        'chat_id': ['27811316', '27811317'],
-        'ai_IssueIdentification': [4, 3],
-        'ai_ResolutionCompliance': [3, 2],
-        'ai_Clarity': [2, 3],
-        'ai_Retention': [2, 3],
-        'ai_Sentiment': [3, 4],
-        'ai_CustomerCentricity': [4, 3],
-        'human_IssueIdentification': [4, 4],
-        'human_ResolutionCompliance': [3, 3],
-        'human_Clarity': [2, 2],
-        'human_Retention': [2, 3],
-        'human_Sentiment': [4, 4],
-        'human_CustomerCentricity': [3, 4]
-    }
-    sample_df = pd.DataFrame(sample_data)
-    
     st.download_button(
         label="📥 Download Sample CSV Template",
-        data=sample_df.to_csv(index=False),
+        data=_SAMPLE_CSV_BYTES,
         file_name="mae_sample_template.csv",
         mime="text/csv"
     )
@@ -176,38 +273,22 @@ elif mode == "Batch Upload (CSV)":
     uploaded_file = st.file_uploader("Choose a CSV file", type=['csv'])
     
     if uploaded_file is not None:
-        df = pd.read_csv(uploaded_file)
+        file_bytes = uploaded_file.getvalue()
+        # Scores are shown as uploaded; range checks happen when scoring
+        df = pd.read_csv(io.BytesIO(file_bytes), dtype={'chat_id': CSV_DTYPES['chat_id']}, nrows=5)
         
         st.subheader("Preview Data")
-        st.dataframe(df.head(), use_container_width=True)
+        st.dataframe(df, use_container_width=True)
         
         if st.button("Calculate Batch MAE", type="primary"):
-            # Process the data
-            chats = []
-            for _, row in df.iterrows():
-                ai_scores = {
-                    'IssueIdentification': int(row['ai_IssueIdentification']),
-                    'ResolutionCompliance': int(row['ai_ResolutionCompliance']),
-                    'Clarity': int(row['ai_Clarity']),
-                    'Retention': int(row['ai_Retention']),
-                    'Sentiment': int(row['ai_Sentiment']),
-                    'CustomerCentricity': int(row['ai_CustomerCentricity'])
-                }
-                human_scores = {
-                    'IssueIdentification': int(row['human_IssueIdentification']),
-                    'ResolutionCompliance': int(row['human_ResolutionCompliance']),
-                    'Clarity': int(row['human_Clarity']),
-                    'Retention': int(row['human_Retention']),
-                    'Sentiment': int(row['human_Sentiment']),
-                    'CustomerCentricity': int(row['human_CustomerCentricity'])
-                }
-                chats.append({
-                    'chat_id': str(row['chat_id']),
-                    'ai_scores': ai_scores,
-                    'human_scores': human_scores
-                })
-            
-            avg_mae, results = calculate_batch_mae(chats)
+            try:
+                avg_mae, results_df, results_csv = _parse_and_score(file_bytes)
+            except KeyError as e:
+                st.error(f"❌ This file is missing required columns: {e.args[0]}")
+                st.stop()
+            except ValueError as e:
+                st.error(f"❌ Could not score this file: {e}")
+                st.stop()
             
             st.markdown("---")
             st.header("📊 Batch Results")
@@ -217,7 +298,7 @@ elif mode == "Batch Upload (CSV)":
             with col1:
                 st.metric("Average MAE", f"{avg_mae:.2f}")
             with col2:
-                st.metric("Total Chats", len(chats))
+                st.metric("Total Chats", len(results_df))
             with col3:
                 mae_class = get_mae_color_class(avg_mae)
                 st.markdown(f'<p class="{mae_class}" style="font-size: 1.2rem; margin-top: 0.5rem;">{interpret_mae(avg_mae)}</p>', 
@@ -225,22 +306,17 @@ elif mode == "Batch Upload (CSV)":
             
             # Detailed results table
             st.subheader("Individual Chat Results")
-            results_data = []
-            for chat, result in zip(chats, results):
-                results_data.append({
-                    'Chat ID': chat['chat_id'],
-                    'MAE': f"{result.mae:.2f}",
-                    'Total Diff': result.total_difference,
-                    'Interpretation': result.interpretation
-                })
-            
-            results_df = pd.DataFrame(results_data)
-            st.dataframe(results_df, use_container_width=True, hide_index=True)
+            st.dataframe(
+                results_df,
+                use_container_width=True,
+                hide_index=True,
+                column_config={'MAE': st.column_config.NumberColumn(format="%.2f")}
+            )
             
             # Download results
             st.download_button(
                 label="📥 Download Results CSV",
-                data=results_df.to_csv(index=False),
+                data=results_csv,
                 file_name=f"mae_results_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
                 mime="text/csv"
             )
@@ -290,13 +366,14 @@ else:
                 st.error("❌ Mismatch")
         
         st.subheader("Detailed Breakdown")
+        kpi_differences = result.kpi_differences
         df_data = []
         for kpi in KPIS:
             df_data.append({
                 'KPI': kpi,
                 'AI Score': ai_scores[kpi],
                 'Human Score': human_scores[kpi],
-                'Difference': result.kpi_differences[kpi]
+                'Difference': kpi_differences[kpi]
             })
         
         df = pd.DataFrame(df_data)
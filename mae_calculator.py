@@ -3,24 +3,145 @@ MAE Calculator for Super Analyst QA System
 Calculates Mean Absolute Error between AI and Human analyst scores
 """
 
+import io
+import os
+import sys
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Tuple
 from dataclasses import dataclass
 
+import numpy as np
 
-@dataclass
+try:
+    import numba
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    _NUMBA_AVAILABLE = False
+
+
+# KPI order shared by the dict and matrix code paths
+KPIS = [
+    'IssueIdentification',
+    'ResolutionCompliance',
+    'Clarity',
+    'Retention',
+    'Sentiment',
+    'CustomerCentricity'
+]
+KPIS_TUPLE = tuple(KPIS)
+_KPIS_FROZEN = frozenset(KPIS)
+
+# Valid range for every AI and human KPI score
+SCORE_MIN, SCORE_MAX = 0, 5
+
+# MAE interpretation bands: a value below _MAE_THRESHOLDS[i] gets _MAE_LABELS[i]
+_MAE_THRESHOLDS = (0.50, 0.75, 1.00)
+_MAE_LABELS = (
+    "Excellent (matches human analyst very closely)",
+    "Good (production-ready)",
+    "Acceptable (needs minor calibration)",
+    "Poor (needs major fixes)"
+)
+_MAE_LABELS_ARR = np.array(_MAE_LABELS, dtype=object)
+
+# Rows per tile in the batch kernel; keeps the scratch buffer cache-resident
+_BATCH_TILE_ROWS = 4096
+
+# Threads only pay off without a GIL, and only on batches this large
+_FREE_THREADED = not getattr(sys, '_is_gil_enabled', lambda: True)()
+_PARALLEL_MIN_ROWS = 1 << 18
+
+
+@dataclass(slots=True)
 class MAEResult:
     """Results from MAE calculation"""
     mae: float
-    total_difference: float
+    total_difference: int
     num_kpis: int
-    kpi_differences: Dict[str, float]
+    kpi_diff_arr: np.ndarray  # integer absolute differences, in KPIS order
     interpretation: str
     
+    @property
+    def kpi_differences(self) -> Dict[str, int]:
+        """Per-KPI absolute differences keyed by KPI name"""
+        return dict(zip(KPIS_TUPLE, self.kpi_diff_arr.tolist()))
 
-def calculate_mae(ai_scores: Dict[str, int], human_scores: Dict[str, int]) -> MAEResult:
+
+def _checked_scores(scores: np.ndarray) -> np.ndarray:
+    """Check scores are whole numbers from SCORE_MIN to SCORE_MAX, then narrow to int8"""
+    # Integer input is already whole; for floats NaN never equals itself, so it fails too
+    whole = scores.dtype.kind in 'iu' or (scores == np.round(scores)).all()
+    in_range = scores.size == 0 or (scores.min() >= SCORE_MIN and scores.max() <= SCORE_MAX)
+    if not (whole and in_range):
+        raise ValueError(f"Scores must be whole numbers from {SCORE_MIN} to {SCORE_MAX}")
+    return scores.astype(np.int8, copy=False)
+
+
+def _mae_kernel(ai: np.ndarray, human: np.ndarray) -> Tuple[float, int, np.ndarray]:
+    """Per-chat MAE kernel: returns (mae, total_difference, int8 differences)"""
+    # Callers pass scores through _checked_scores, so int8 differences cannot wrap
+    diff = np.abs(ai - human)
+    # For a handful of KPIs, summing a Python list beats ndarray.sum() call overhead
+    total = sum(diff.tolist())
+    return total / len(ai), total, diff
+
+
+if _NUMBA_AVAILABLE:
+    # Serial on purpose: Streamlit scores each session on its own thread, and
+    # numba's default parallel threading layer is not safe for concurrent callers
+    @numba.njit(cache=True, fastmath=True)
+    def _fused_mae(ai_mat, human_mat, total_out, mae_out):
+        # Subtract, abs and sum in one pass; no (N, K) intermediate is materialized
+        n, k = ai_mat.shape
+        for i in range(n):
+            s = 0
+            for j in range(k):
+                d = np.int32(ai_mat[i, j]) - np.int32(human_mat[i, j])
+                s += d if d >= 0 else -d
+            total_out[i] = s
+            mae_out[i] = s / k
+    
+    # Compile once at import so the first UI click doesn't pay for the JIT
+    _fused_mae(np.zeros((1, len(KPIS)), dtype=np.int8), np.zeros((1, len(KPIS)), dtype=np.int8),
+               np.empty(1, dtype=np.int32), np.empty(1))
+
+
+def calculate_mae_arr(ai: np.ndarray, human: np.ndarray) -> MAEResult:
     """
     Calculate MAE between AI and human scores for a single chat.
     
+    Args:
+        ai: Array of AI scores, one entry per KPI in KPIS order
+        human: Array of human scores in the same order
+        
+    Returns:
+        MAEResult object with calculation details
+        
+    Raises:
+        ValueError: If any score is not a whole number from SCORE_MIN to SCORE_MAX
+        
+    Example:
+        >>> ai = np.array([4, 3, 2, 2, 3, 4], dtype=np.int8)
+        >>> human = np.array([4, 3, 2, 2, 4, 3], dtype=np.int8)
+        >>> result = calculate_mae_arr(ai, human)
+        >>> print(f"MAE: {result.mae:.2f}")
+    """
+    mae, total_difference, kpi_diff_arr = _mae_kernel(_checked_scores(ai), _checked_scores(human))
+    
+    return MAEResult(
+        mae=float(mae),
+        total_difference=int(total_difference),
+        num_kpis=len(ai),
+        kpi_diff_arr=kpi_diff_arr,
+        interpretation=interpret_mae(mae)
+    )
+
+
+def calculate_mae(ai_scores: Dict[str, int], human_scores: Dict[str, int]) -> MAEResult:
+    """
+    Calculate MAE from KPI-name dictionaries; thin adapter over calculate_mae_arr.
+    
     Args:
         ai_scores: Dictionary of KPI names to AI scores (e.g., {"IssueIdentification": 4})
         human_scores: Dictionary of KPI names to human scores
@@ -28,33 +149,25 @@ def calculate_mae(ai_scores: Dict[str, int], human_scores: Dict[str, int]) -> MA
     Returns:
         MAEResult object with calculation details
         
+    Raises:
+        ValueError: If the KPIs don't match KPIS or a score is not a whole number
+            from SCORE_MIN to SCORE_MAX
+        
     Example:
-        >>> ai = {"IssueIdentification": 4, "Clarity": 2, "Sentiment": 3}
-        >>> human = {"IssueIdentification": 4, "Clarity": 2, "Sentiment": 4}
+        >>> ai = {kpi: 3 for kpi in KPIS}
+        >>> human = {**ai, "Sentiment": 4}
         >>> result = calculate_mae(ai, human)
         >>> print(f"MAE: {result.mae:.2f}")
     """
-    if set(ai_scores.keys()) != set(human_scores.keys()):
-        raise ValueError("AI and human scores must have the same KPIs")
-    
-    kpi_differences = {}
-    total_difference = 0.0
+    # dict_keys compares against a set without building a new one
+    if ai_scores.keys() != _KPIS_FROZEN or human_scores.keys() != _KPIS_FROZEN:
+        raise ValueError(f"AI and human scores must both cover exactly these KPIs: {KPIS}")
     
-    for kpi in ai_scores.keys():
-        diff = abs(ai_scores[kpi] - human_scores[kpi])
-        kpi_differences[kpi] = diff
-        total_difference += diff
-    
-    num_kpis = len(ai_scores)
-    mae = total_difference / num_kpis if num_kpis > 0 else 0.0
-    interpretation = interpret_mae(mae)
-    
-    return MAEResult(
-        mae=mae,
-        total_difference=total_difference,
-        num_kpis=num_kpis,
-        kpi_differences=kpi_differences,
-        interpretation=interpretation
+    # Read as float64 so out-of-range or fractional scores reach the range check intact
+    num_kpis = len(KPIS_TUPLE)
+    return calculate_mae_arr(
+        np.fromiter((ai_scores[kpi] for kpi in KPIS_TUPLE), dtype=np.float64, count=num_kpis),
+        np.fromiter((human_scores[kpi] for kpi in KPIS_TUPLE), dtype=np.float64, count=num_kpis)
     )
 
 
@@ -68,14 +181,78 @@ def interpret_mae(mae: float) -> str:
     Returns:
         String interpretation of the MAE
     """
-    if mae < 0.50:
-        return "Excellent (matches human analyst very closely)"
-    elif mae < 0.75:
-        return "Good (production-ready)"
-    elif mae < 1.00:
-        return "Acceptable (needs minor calibration)"
+    return _MAE_LABELS[bisect_right(_MAE_THRESHOLDS, mae)]
+
+
+def interpret_mae_batch(maes: np.ndarray) -> np.ndarray:
+    """
+    Interpret an array of MAE values in one pass.
+    
+    Args:
+        maes: Array of Mean Absolute Error values
+        
+    Returns:
+        Object array of string interpretations, same length as maes
+    """
+    return _MAE_LABELS_ARR[np.searchsorted(_MAE_THRESHOLDS, maes, side='right')]
+
+
+def _sum_abs_diff_tiled(ai_mat: np.ndarray, human_mat: np.ndarray, total_out: np.ndarray) -> None:
+    """Write each row's sum of absolute differences into total_out, tile by tile"""
+    num_chats, num_kpis = ai_mat.shape
+    diff_buf = np.empty((min(num_chats, _BATCH_TILE_ROWS), num_kpis), dtype=np.int16)
+    
+    # Reuse one scratch buffer per tile instead of allocating an (N, K) diff array
+    for start in range(0, num_chats, _BATCH_TILE_ROWS):
+        end = min(start + _BATCH_TILE_ROWS, num_chats)
+        buf = diff_buf[:end - start]
+        # Subtract in int16 so int8 differences cannot wrap
+        np.subtract(ai_mat[start:end], human_mat[start:end], out=buf, dtype=np.int16)
+        np.abs(buf, out=buf)
+        buf.sum(axis=1, dtype=np.int32, out=total_out[start:end])
+
+
+def calculate_batch_mae_fast(ai_mat: np.ndarray,
+                             human_mat: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculate MAE for many chats at once from score matrices.
+    
+    Args:
+        ai_mat: int8 array of shape (N, len(KPIS)) with AI scores, columns in KPIS order
+        human_mat: int8 array of the same shape with human scores
+        
+    Returns:
+        Tuple of (mae per chat as float64 array, sum of differences per chat,
+        interpretation per chat)
+    """
+    if ai_mat.shape != human_mat.shape:
+        raise ValueError("AI and human score matrices must have the same shape")
+    if not (np.issubdtype(ai_mat.dtype, np.integer) and np.issubdtype(human_mat.dtype, np.integer)):
+        raise ValueError("AI and human score matrices must have an integer dtype")
+    
+    num_chats, num_kpis = ai_mat.shape
+    total = np.empty(num_chats, dtype=np.int32)
+    
+    if _NUMBA_AVAILABLE:
+        mae = np.empty(num_chats)
+        _fused_mae(ai_mat, human_mat, total, mae)
+        return mae, total, interpret_mae_batch(mae)
+    
+    if _FREE_THREADED and num_chats >= _PARALLEL_MIN_ROWS:
+        # Disjoint row ranges, each thread writing its own slice of total
+        bounds = np.linspace(0, num_chats, (os.cpu_count() or 1) + 1, dtype=np.int64).tolist()
+        with ThreadPoolExecutor() as executor:
+            list(executor.map(
+                lambda start, end: _sum_abs_diff_tiled(ai_mat[start:end], human_mat[start:end],
+                                                       total[start:end]),
+                bounds[:-1], bounds[1:]
+            ))
     else:
-        return "Poor (needs major fixes)"
+        _sum_abs_diff_tiled(ai_mat, human_mat, total)
+    
+    mae = total / num_kpis
+    
+    return mae, total, interpret_mae_batch(mae)
 
 
 def calculate_batch_mae(chats: List[Dict]) -> Tuple[float, List[MAEResult]]:
@@ -85,33 +262,88 @@ def calculate_batch_mae(chats: List[Dict]) -> Tuple[float, List[MAEResult]]:
     Args:
         chats: List of dictionaries, each containing:
                - 'chat_id': identifier
-               - 'ai_scores': dict of KPI scores
-               - 'human_scores': dict of KPI scores
+               - 'ai_scores': dict of scores for every KPI in KPIS
+               - 'human_scores': dict of scores for every KPI in KPIS
                
     Returns:
         Tuple of (average_mae, list of individual MAEResults)
         
+    Raises:
+        ValueError: If any score is not a whole number from SCORE_MIN to SCORE_MAX
+        
     Example:
         >>> chats = [
         ...     {
         ...         'chat_id': '27811316',
-        ...         'ai_scores': {'IssueIdentification': 4, 'Clarity': 2},
-        ...         'human_scores': {'IssueIdentification': 4, 'Clarity': 2}
+        ...         'ai_scores': {kpi: 3 for kpi in KPIS},
+        ...         'human_scores': {kpi: 4 for kpi in KPIS}
         ...     }
         ... ]
         >>> avg_mae, results = calculate_batch_mae(chats)
     """
-    results = []
+    # Read as float64 so out-of-range or fractional scores reach the range check intact
+    num_kpis = len(KPIS)
+    ai_mat = _checked_scores(np.array([[c['ai_scores'][k] for k in KPIS_TUPLE] for c in chats],
+                                      dtype=np.float64).reshape(-1, num_kpis))
+    human_mat = _checked_scores(np.array([[c['human_scores'][k] for k in KPIS_TUPLE] for c in chats],
+                                         dtype=np.float64).reshape(-1, num_kpis))
     
-    for chat in chats:
-        result = calculate_mae(chat['ai_scores'], chat['human_scores'])
-        results.append(result)
+    mae_vec, total_vec, interp_arr = calculate_batch_mae_fast(ai_mat, human_mat)
+    avg_mae = float(mae_vec.mean()) if len(mae_vec) else 0.0
+    # Widen like the batch kernels do, so per-KPI differences always agree with the totals;
+    # each result keeps a row view
+    diff_mat = np.abs(np.subtract(ai_mat, human_mat, dtype=np.int16))
     
-    avg_mae = sum(r.mae for r in results) / len(results) if results else 0.0
+    results = []
+    for diff_row, mae, total, interpretation in zip(diff_mat, mae_vec.tolist(),
+                                                    total_vec.tolist(), interp_arr):
+        results.append(MAEResult(
+            mae=mae,
+            total_difference=total,
+            num_kpis=num_kpis,
+            kpi_diff_arr=diff_row,
+            interpretation=interpretation
+        ))
     
     return avg_mae, results
 
 
+def format_mae_report(chat_id: str, result: MAEResult, ai_scores: Dict[str, int],
+                      human_scores: Dict[str, int]) -> str:
+    """
+    Build a formatted MAE report for a single chat.
+    
+    Args:
+        chat_id: Chat identifier
+        result: MAEResult object
+        ai_scores: AI scores dictionary
+        human_scores: Human scores dictionary
+        
+    Returns:
+        The report text, ready to print or display
+    """
+    buf = io.StringIO()
+    buf.write(f"\n{'='*70}\n")
+    buf.write(f"MAE REPORT - ChatID: {chat_id}\n")
+    buf.write(f"{'='*70}\n")
+    buf.write(f"\n{'KPI':<25} {'AI':>5} {'Human':>7} {'|Diff|':>8}\n")
+    buf.write(f"{'-'*70}\n")
+    
+    kpi_differences = result.kpi_differences
+    buf.writelines(
+        f"{kpi:<25} {ai_scores[kpi]:>5} {human_scores[kpi]:>7} {kpi_differences[kpi]:>8.0f}\n"
+        for kpi in ai_scores.keys()
+    )
+    
+    buf.write(f"{'-'*70}\n")
+    buf.write(f"{'Sum of differences:':<25} {result.total_difference:>21.0f}\n")
+    buf.write(f"{'Number of KPIs:':<25} {result.num_kpis:>21}\n")
+    buf.write(f"\n{'MAE:':<25} {result.mae:>21.2f}\n")
+    buf.write(f"{'Interpretation:':<25} {result.interpretation}\n")
+    buf.write(f"{'='*70}\n\n")
+    return buf.getvalue()
+
+
 def print_mae_report(chat_id: str, result: MAEResult, ai_scores: Dict[str, int], 
                      human_scores: Dict[str, int]) -> None:
     """
@@ -123,24 +355,36 @@ def print_mae_report(chat_id: str, result: MAEResult, ai_scores: Dict[str, int],
         ai_scores: AI scores dictionary
         human_scores: Human scores dictionary
     """
-    print(f"\n{'='*70}")
-    print(f"MAE REPORT - ChatID: {chat_id}")
-    print(f"{'='*70}")
-    print(f"\n{'KPI':<25} {'AI':>5} {'Human':>7} {'|Diff|':>8}")
-    print(f"{'-'*70}")
+    sys.stdout.write(format_mae_report(chat_id, result, ai_scores, human_scores))
+
+
+def format_batch_report(avg_mae: float, chat_results: List[Tuple[str, MAEResult]]) -> str:
+    """
+    Build a summary report for batch MAE calculation.
     
-    for kpi in ai_scores.keys():
-        ai = ai_scores[kpi]
-        human = human_scores[kpi]
-        diff = result.kpi_differences[kpi]
-        print(f"{kpi:<25} {ai:>5} {human:>7} {diff:>8.0f}")
+    Args:
+        avg_mae: Average MAE across all chats
+        chat_results: List of tuples (chat_id, MAEResult)
+        
+    Returns:
+        The report text, ready to print or display
+    """
+    buf = io.StringIO()
+    buf.write(f"\n{'='*70}\n")
+    buf.write(f"BATCH MAE REPORT - {len(chat_results)} Chats\n")
+    buf.write(f"{'='*70}\n")
+    buf.write(f"\n{'ChatID':<15} {'MAE':>10} {'Interpretation':<40}\n")
+    buf.write(f"{'-'*70}\n")
+    
+    buf.writelines(
+        f"{chat_id:<15} {result.mae:>10.2f} {result.interpretation:<40}\n"
+        for chat_id, result in chat_results
+    )
     
-    print(f"{'-'*70}")
-    print(f"{'Sum of differences:':<25} {result.total_difference:>21.0f}")
-    print(f"{'Number of KPIs:':<25} {result.num_kpis:>21}")
-    print(f"\n{'MAE:':<25} {result.mae:>21.2f}")
-    print(f"{'Interpretation:':<25} {result.interpretation}")
-    print(f"{'='*70}\n")
+    buf.write(f"{'-'*70}\n")
+    buf.write(f"{'AVERAGE MAE:':<15} {avg_mae:>10.2f} {interpret_mae(avg_mae):<40}\n")
+    buf.write(f"{'='*70}\n\n")
+    return buf.getvalue()
 
 
 def print_batch_report(avg_mae: float, chat_results: List[Tuple[str, MAEResult]]) -> None:
@@ -151,18 +395,7 @@ def print_batch_report(avg_mae: float, chat_results: List[Tuple[str, MAEResult]]
         avg_mae: Average MAE across all chats
         chat_results: List of tuples (chat_id, MAEResult)
     """
-    print(f"\n{'='*70}")
-    print(f"BATCH MAE REPORT - {len(chat_results)} Chats")
-    print(f"{'='*70}")
-    print(f"\n{'ChatID':<15} {'MAE':>10} {'Interpretation':<40}")
-    print(f"{'-'*70}")
-    
-    for chat_id, result in chat_results:
-        print(f"{chat_id:<15} {result.mae:>10.2f} {result.interpretation:<40}")
-    
-    print(f"{'-'*70}")
-    print(f"{'AVERAGE MAE:':<15} {avg_mae:>10.2f} {interpret_mae(avg_mae):<40}")
-    print(f"{'='*70}\n")
+    sys.stdout.write(format_batch_report(avg_mae, chat_results))
 
 
 # Example usage
@@ -0,0 +1,110 @@
+"""
+Checks for the batch MAE kernels against a plain NumPy reference
+"""
+
+import numpy as np
+import pytest
+
+import mae_calculator
+from mae_calculator import _sum_abs_diff_tiled, _BATCH_TILE_ROWS
+
+
+def _reference_totals(ai_mat, human_mat):
+    return np.abs(ai_mat.astype(np.int32) - human_mat).sum(axis=1)
+
+
+def _tiled_totals(ai_mat, human_mat):
+    total = np.empty(len(ai_mat), dtype=np.int32)
+    _sum_abs_diff_tiled(ai_mat, human_mat, total)
+    return total
+
+
+@pytest.mark.parametrize("num_kpis", [3, 6, 9])
+def test_tiled_matches_reference(num_kpis):
+    rng = np.random.default_rng(num_kpis)
+    # More than one tile, with a partial last tile, over the full int8 range
+    shape = (2 * _BATCH_TILE_ROWS + 17, num_kpis)
+    ai_mat = rng.integers(-128, 128, shape, dtype=np.int8)
+    human_mat = rng.integers(-128, 128, shape, dtype=np.int8)
+    
+    np.testing.assert_array_equal(_tiled_totals(ai_mat, human_mat),
+                                  _reference_totals(ai_mat, human_mat))
+
+
+def test_tiled_empty_batch():
+    empty = np.empty((0, 6), dtype=np.int8)
+    assert len(_tiled_totals(empty, empty)) == 0
+
+
+@pytest.mark.skipif(not mae_calculator._NUMBA_AVAILABLE, reason="numba is not installed")
+@pytest.mark.parametrize("num_kpis", [1, 6, 9])
+def test_fused_mae_matches_reference(num_kpis):
+    rng = np.random.default_rng(num_kpis)
+    # Full int8 range, so a kernel that subtracts without widening would wrap
+    ai_mat = rng.integers(-128, 128, (1000, num_kpis), dtype=np.int8)
+    human_mat = rng.integers(-128, 128, (1000, num_kpis), dtype=np.int8)
+    total = np.empty(len(ai_mat), dtype=np.int32)
+    mae = np.empty(len(ai_mat))
+    
+    mae_calculator._fused_mae(ai_mat, human_mat, total, mae)
+    expected = _reference_totals(ai_mat, human_mat)
+    np.testing.assert_array_equal(total, expected)
+    np.testing.assert_allclose(mae, expected / num_kpis)
+
+
+@pytest.mark.parametrize("num_chats", [1, 5, 1001])
+def test_threaded_batch_matches_single_thread(monkeypatch, num_chats):
+    rng = np.random.default_rng(num_chats)
+    ai_mat = rng.integers(0, 6, (num_chats, 6), dtype=np.int8)
+    human_mat = rng.integers(0, 6, (num_chats, 6), dtype=np.int8)
+    monkeypatch.setattr(mae_calculator, '_NUMBA_AVAILABLE', False)
+    single = mae_calculator.calculate_batch_mae_fast(ai_mat, human_mat)
+    
+    # Shard even tiny batches, over more threads than some of them have rows
+    monkeypatch.setattr(mae_calculator, '_FREE_THREADED', True)
+    monkeypatch.setattr(mae_calculator, '_PARALLEL_MIN_ROWS', 1)
+    monkeypatch.setattr(mae_calculator.os, 'cpu_count', lambda: 7)
+    threaded = mae_calculator.calculate_batch_mae_fast(ai_mat, human_mat)
+    
+    for single_arr, threaded_arr in zip(single, threaded):
+        np.testing.assert_array_equal(threaded_arr, single_arr)
+
+
+@pytest.mark.parametrize("bad_score", [3.7, -1, 6, 100, 300, float('nan')])
+def test_calculate_mae_rejects_invalid_scores(bad_score):
+    human = {kpi: 3 for kpi in mae_calculator.KPIS}
+    ai = {**human, 'Sentiment': bad_score}
+    with pytest.raises(ValueError):
+        mae_calculator.calculate_mae(ai, human)
+
+
+def test_calculate_mae_arr_keeps_unsigned_differences():
+    ai = np.full(6, 2, dtype=np.uint8)
+    human = np.full(6, 3, dtype=np.uint8)
+    result = mae_calculator.calculate_mae_arr(ai, human)
+    assert result.total_difference == 6
+    assert result.kpi_diff_arr.tolist() == [1] * 6
+
+
+def test_calculate_batch_mae_rejects_fractional_scores():
+    chats = [{'chat_id': '1',
+              'ai_scores': {kpi: 3.7 for kpi in mae_calculator.KPIS},
+              'human_scores': {kpi: 3 for kpi in mae_calculator.KPIS}}]
+    with pytest.raises(ValueError):
+        mae_calculator.calculate_batch_mae(chats)
+
+
+def test_calculate_batch_mae_differences_agree_with_totals():
+    rng = np.random.default_rng(0)
+    chats = [{'chat_id': str(i),
+              'ai_scores': dict(zip(mae_calculator.KPIS, rng.integers(0, 6, 6).tolist())),
+              'human_scores': dict(zip(mae_calculator.KPIS, rng.integers(0, 6, 6).tolist()))}
+             for i in range(50)]
+    avg_mae, results = mae_calculator.calculate_batch_mae(chats)
+    
+    for chat, result in zip(chats, results):
+        expected = mae_calculator.calculate_mae(chat['ai_scores'], chat['human_scores'])
+        assert result.kpi_differences == expected.kpi_differences
+        assert result.total_difference == sum(result.kpi_differences.values())
+    assert avg_mae == pytest.approx(np.mean([result.mae for result in results]))
+    assert mae_calculator.calculate_batch_mae([]) == (0.0, [])